@@ -0,0 +1,39 @@
+"""Compile the LightGBM booster inside ``final_model.joblib`` with Treelite.
+
+Produces ``models/final_model.so``, which ``app.py`` loads at startup (when
+``tl2cgen`` is installed) in place of the Python LightGBM predictor.  Re-run
+after every retrain; the calibration step stays in the joblib artefact.
+
+    python compile_treelite.py
+"""
+
+import os
+
+import joblib
+import treelite
+import tl2cgen
+
+BASE_DIR   = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+LIB_PATH   = os.path.join(MODELS_DIR, "final_model.so")
+
+
+def main():
+    model   = joblib.load(os.path.join(MODELS_DIR, "final_model.joblib"))
+    booster = model.calibrated_classifiers_[0].estimator.booster_
+
+    print("[INFO]  Converting LightGBM booster to Treelite ...")
+    tl_model = treelite.frontend.from_lightgbm(booster)
+
+    print(f"[INFO]  Compiling to {LIB_PATH} ...")
+    tl2cgen.export_lib(
+        tl_model,
+        toolchain="gcc",
+        libpath=LIB_PATH,
+        params={"parallel_comp": os.cpu_count() or 4},
+    )
+    print("[INFO]  Done")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""
+Gunicorn configuration for the cervical clinical model API.
+
+    gunicorn -c gunicorn_conf.py app:app
+
+The app is preloaded so the pipeline, model and Treelite predictor are loaded
+once in the master and shared with the workers via copy-on-write fork.
+"""
+
+import os
+
+# One OpenMP thread per worker for LightGBM; must be set before it is imported.
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5010)}"
+preload_app = True
+workers = int(os.environ.get("WEB_CONCURRENCY", max(2, (os.cpu_count() or 2) // 2)))
+worker_class = "gthread"
+threads = 4
+timeout = 60
@@ -0,0 +1,52 @@
+"""Export the ResNet-50 model to ONNX for serving with ONNX Runtime.
+
+Writes ``models/resnet50.onnx`` plus a graph-optimised ``models/resnet50.opt.onnx``
+(Conv+BN+ReLU fusion, constant folding).  ``model_server.py`` picks the optimised
+file up automatically when ``onnxruntime`` is installed.  Re-run after
+regenerating ``resnet50_weights.pt``.
+
+    python export_onnx.py
+"""
+
+import onnxruntime as ort
+import torch
+
+import model_server
+
+ONNX_PATH = model_server.MODEL_DIR / "resnet50.onnx"
+OPT_PATH = model_server.MODEL_DIR / "resnet50.opt.onnx"
+
+
+def main():
+    if model_server.model is None:
+        raise SystemExit("[ERROR] Model failed to load — see messages above.")
+
+    w, h = model_server.img_size  # (width, height)
+    dummy = torch.randn(1, 3, h, w)
+    print(f"[INFO]  Exporting to {ONNX_PATH} ...")
+    torch.onnx.export(
+        model_server.model.eval(),
+        dummy,
+        str(ONNX_PATH),
+        opset_version=17,
+        input_names=["input"],
+        output_names=["logits"],
+        dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+    )
+
+    print(f"[INFO]  Writing optimised graph to {OPT_PATH} ...")
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    opts.optimized_model_filepath = str(OPT_PATH)
+    session = ort.InferenceSession(str(ONNX_PATH), sess_options=opts, providers=["CPUExecutionProvider"])
+
+    # Sanity check against the PyTorch model
+    with torch.inference_mode():
+        expected = model_server.model(dummy).numpy()
+    got = session.run(None, {"input": dummy.numpy()})[0]
+    print(f"[INFO]  Max |torch - onnx| logit difference: {abs(expected - got).max():.2e}")
+    print("[INFO]  Done")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Export the FastAI learner to a plain PyTorch checkpoint for ``model_server.py``.
+
+Unpickling ``export.pkl`` needs fastai plus the pathlib / IPython / plum-dispatch
+compatibility shims below.  This script does that once and writes
+``models/resnet50_weights.pt`` holding the model ``state_dict``, the class
+vocabulary and the preprocessing parameters, which the server loads with a
+straight ``torch.load``.  Re-run after replacing ``export.pkl``.
+Needs the packages in ``requirements-export.txt``.
+
+    python export_weights.py [path/to/export.pkl]
+"""
+
+import os
+import pathlib
+import platform
+import sys
+import types
+
+# ── Patch: Linux/Windows path compatibility ─────────────────────────────────
+# Models trained on Linux save PosixPath objects inside the pickle; on Windows
+# the deserialiser will choke unless we alias PosixPath → WindowsPath.
+if platform.system() == "Windows":
+    pathlib.PosixPath = pathlib.WindowsPath
+
+# ── Patch: Mock IPython to prevent progress-bar crashes ─────────────────────
+try:
+    import IPython  # noqa: F401
+except ImportError:
+    from unittest.mock import MagicMock
+
+    _mock = MagicMock()
+    sys.modules["IPython"] = _mock
+    sys.modules["IPython.display"] = _mock
+
+# ── Patch: plum-dispatch version compatibility ──────────────────────────────
+# The model was trained with an older plum-dispatch that possessed sub-modules
+# like `plum.function`, `plum.resolver`, `plum.signature`, etc. Later versions
+# reorganized the namespace. We mapped legacy paths to modern counterparts.
+try:
+    import plum
+
+    def _shim_plum(public_name, private_name=None):
+        if private_name is None:
+            private_name = "_" + public_name.split('.')[-1]
+        full_private = "plum." + private_name if not private_name.startswith("plum.") else private_name
+        try:
+            mod = __import__(full_private, fromlist=['*'])
+            sys.modules[public_name] = mod
+            setattr(plum, public_name.split('.')[-1], mod)
+        except ImportError:
+            # Fallback to root plum namespace for missing submodules
+            shim = types.ModuleType(public_name)
+            shim.__dict__.update({k: v for k, v in plum.__dict__.items() if not k.startswith('_')})
+            sys.modules[public_name] = shim
+            setattr(plum, public_name.split('.')[-1], shim)
+
+    # Legacy modules used by the pickled model
+    for mod_name in ['function', 'resolver', 'signature', 'type', 'method', 'util', 'promotion', 'dispatcher']:
+        _shim_plum(f'plum.{mod_name}', f'_{mod_name}')
+
+    # Stub missing classes if they moved or were removed
+    if not hasattr(plum.type, 'Type'):
+        class _TypeStub: pass
+        plum.type.Type = _TypeStub
+except ImportError:
+    pass  # plum not installed — unpickling will report what is missing
+
+import pickle  # noqa: E402
+from pathlib import Path  # noqa: E402
+
+import torch  # noqa: E402
+from fastai.vision.all import Normalize, Resize  # noqa: E402
+
+MODEL_DIR = Path(__file__).resolve().parent / "models"
+PKL_PATH = MODEL_DIR / "export.pkl"
+WEIGHTS_PATH = MODEL_DIR / "resnet50_weights.pt"
+
+
+def export(pkl_path=PKL_PATH, weights_path=WEIGHTS_PATH):
+    """Convert the learner at ``pkl_path``; returns ``(learner model, checkpoint)``.
+
+    Also called by ``model_server.load_model`` when the checkpoint is missing
+    and fastai is installed.
+    """
+    print(f"[INFO]  Loading learner from {pkl_path} ...")
+    # Direct torch.load — fastai 2.8.x's load_learner swallows ImportErrors.
+    learn = torch.load(pkl_path, map_location="cpu", pickle_module=pickle, weights_only=False)
+    net = learn.model.float().eval()
+
+    resize = next(t for t in learn.dls.after_item.fs if isinstance(t, Resize))
+    norm = next(t for t in learn.dls.after_batch.fs if isinstance(t, Normalize))
+    ckpt = {
+        "state_dict": net.state_dict(),
+        "vocab": [str(c) for c in learn.dls.vocab],
+        "mean": norm.mean.detach().cpu().float().flatten().tolist(),
+        "std": norm.std.detach().cpu().float().flatten().tolist(),
+        "size": list(resize.size),  # (width, height), fastai's order
+        # model_server.preprocess_image implements one Resize flavour only;
+        # it checks these at load time
+        "method": str(resize.method),
+        "pad_mode": str(resize.pad_mode),
+    }
+    # Write-then-rename so a concurrently starting server never sees half a file
+    tmp_path = Path(weights_path).with_suffix(".pt.tmp")
+    torch.save(ckpt, tmp_path)
+    os.replace(tmp_path, weights_path)
+    print(f"[INFO]  Wrote {weights_path}  Classes: {ckpt['vocab']}")
+    return net, ckpt
+
+
+def main():
+    pkl_path = Path(sys.argv[1]) if len(sys.argv) > 1 else PKL_PATH
+    net, ckpt = export(pkl_path)
+
+    # Sanity check: the server's plain-torch rebuild must match the learner
+    import model_server
+
+    if model_server.model is None:
+        raise SystemExit("[ERROR] model_server failed to load the exported weights.")
+    w, h = ckpt["size"]
+    dummy = torch.randn(2, 3, h, w)
+    with torch.inference_mode():
+        diff = (net(dummy) - model_server.model(dummy)).abs().max().item()
+    print(f"[INFO]  Max |learner - model_server| logit difference: {diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
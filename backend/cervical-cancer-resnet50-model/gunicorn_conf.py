@@ -0,0 +1,32 @@
+"""
+Gunicorn configuration for the cervical cytology model server.
+
+    gunicorn -c gunicorn_conf.py model_server:app
+
+The app is preloaded so the learner (and ONNX session, if any) is loaded once
+in the master and shared with the workers via copy-on-write fork. Each worker
+is pinned to a single intra-op thread so N workers do not oversubscribe cores.
+"""
+
+import os
+
+# Must be set before torch is imported by the preloaded app.
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5009)}"
+preload_app = True
+workers = int(os.environ.get("WEB_CONCURRENCY", max(2, (os.cpu_count() or 2) // 2)))
+worker_class = "gthread"
+threads = 4
+timeout = 120
+
+
+def post_fork(server, worker):
+    import torch
+
+    torch.set_num_threads(1)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Already fixed once inter-op work has started in this process.
+        pass
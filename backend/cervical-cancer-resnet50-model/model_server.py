@@ -10,82 +10,38 @@ Endpoint consumed by the React frontend (CervicalCytology page):
   GET  /health             — liveness / readiness probe
 """
 
-import pathlib
-import platform
-import sys
+import importlib.util
 import os
 
-# ── 1. Patch: Linux/Windows path compatibility ──────────────────────────────
-# Models trained on Linux save PosixPath objects inside the pickle; on Windows
-# the deserialiser will choke unless we alias PosixPath → WindowsPath.
-if platform.system() == "Windows":
-    pathlib.PosixPath = pathlib.WindowsPath
-
-# ── 2. Patch: Mock IPython to prevent progress-bar crashes ──────────────────
+from flask import Flask, request, jsonify
+from flask_cors import CORS
+from pathlib import Path
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torchvision.models import resnet50
+import copy
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import numpy as np
+import base64
+from io import BytesIO
+from PIL import Image as PILImageModule
 try:
-    import IPython  # noqa: F401
+    import onnxruntime as ort  # optional, see export_onnx.py
 except ImportError:
-    from unittest.mock import MagicMock
-
-    _mock = MagicMock()
-    sys.modules["IPython"] = _mock
-    sys.modules["IPython.display"] = _mock
-
-# ── 3. Patch: plum-dispatch version compatibility ───────────────────────────
-# The model was trained with an older plum-dispatch that possessed sub-modules
-# like `plum.function`, `plum.resolver`, `plum.signature`, etc. Later versions 
-# reorganized the namespace. We mapped legacy paths to modern counterparts.
-import types
+    ort = None
 try:
-    import plum
-
-    def _shim_plum(public_name, private_name=None):
-        if private_name is None:
-            private_name = "_" + public_name.split('.')[-1]
-        full_private = "plum." + private_name if not private_name.startswith("plum.") else private_name
-        try:
-            mod = __import__(full_private, fromlist=['*'])
-            sys.modules[public_name] = mod
-            setattr(plum, public_name.split('.')[-1], mod)
-        except ImportError:
-            # Fallback to root plum namespace for missing submodules
-            shim = types.ModuleType(public_name)
-            shim.__dict__.update({k: v for k, v in plum.__dict__.items() if not k.startswith('_')})
-            sys.modules[public_name] = shim
-            setattr(plum, public_name.split('.')[-1], shim)
-
-    # Legacy modules used by the pickled model
-    for mod_name in ['function', 'resolver', 'signature', 'type', 'method', 'util', 'promotion', 'dispatcher']:
-        _shim_plum(f'plum.{mod_name}', f'_{mod_name}')
-
-    # Stub missing classes if they moved or were removed
-    if not hasattr(plum.type, 'Type'):
-        class _TypeStub: pass
-        plum.type.Type = _TypeStub
-
-    print("[INFO]  Applied exhaustive plum compatibility shims")
+    import orjson  # optional, faster JSON encoding
 except ImportError:
-    pass  # plum not installed — handled during model launch
-
-
-
-# ── 4. Imports (after patches) ──────────────────────────────────────────────
-from flask import Flask, request, jsonify  # noqa: E402
-from flask_cors import CORS  # noqa: E402
-from fastai.vision.all import PILImage  # noqa: E402
-from pathlib import Path  # noqa: E402
-import torch  # noqa: E402
-import torch.nn.functional as F  # noqa: E402
-import pickle  # noqa: E402
-import numpy as np  # noqa: E402
-import base64  # noqa: E402
-from io import BytesIO  # noqa: E402
-from PIL import Image as PILImageModule  # noqa: E402
-import matplotlib  # noqa: E402
+    orjson = None
+import matplotlib
 matplotlib.use("Agg")  # non-interactive backend
 import matplotlib.cm as cm  # noqa: E402
 
-# ── 5. Flask app setup ──────────────────────────────────────────────────────
+# ── 1. Flask app setup ──────────────────────────────────────────────────────
 app = Flask(__name__)
 
 # Allow the React dev-server (usually :5173 for Vite or :3000 for CRA)
@@ -94,18 +50,83 @@ CORS(app, resources={
     r"/health":    {"origins": "*"},
 })
 
-# ── 6. Model loading ────────────────────────────────────────────────────────
+# ── 2. Model loading ────────────────────────────────────────────────────────
 MODEL_DIR = Path(__file__).resolve().parent / "models"
-MODEL_FILENAME = "export.pkl"
-
-learn = None  # global learner reference
+MODEL_FILENAME = "resnet50_weights.pt"  # written by export_weights.py
+PKL_FILENAME = "export.pkl"             # the FastAI learner it is converted from
+ONNX_FILENAMES = ("resnet50.opt.onnx", "resnet50.onnx")  # written by export_onnx.py
+
+# Inference state restored from the checkpoint, so requests run a plain
+# PyTorch forward pass with no fastai (or pickle shims) at runtime.
+model = None     # ResNet-50 body + FastAI head, in eval mode
+VOCAB = ()       # class names, index-aligned with the model outputs
+VOCAB_LIST = []  # same, pre-built for the JSON responses
+img_size = (224, 224)  # (width, height), fastai's order
+# (3, 1, 1) affine equivalent of IntToFloatTensor + Normalize:
+#   (x / 255 - mean) / std == x * _scale - _shift
+_scale = None
+_shift = None
+
+# Optional reduced-precision copy of the model, used for classification only
+# (Grad-CAM needs gradients and always runs on the fp32 ``model``):
+#   CERVICAL_INFERENCE_DTYPE=int8 — dynamic int8 quantisation of the Linear head
+#   CERVICAL_INFERENCE_DTYPE=bf16 — bfloat16 weights (CPUs with AVX512-BF16/AMX)
+INFERENCE_DTYPE = os.environ.get("CERVICAL_INFERENCE_DTYPE", "fp32").lower()
+infer_model = None
+_infer_input_dtype = torch.float32
+
+# The fp32 inference model is TorchScript-frozen (Conv+BN folding, oneDNN
+# fusion); set CERVICAL_TORCHSCRIPT=0 to run the eager module instead.
+USE_TORCHSCRIPT = os.environ.get("CERVICAL_TORCHSCRIPT", "1") != "0"
+
+# ONNX Runtime session; when an exported model is present it replaces the
+# PyTorch forward pass for classification (Grad-CAM still uses ``model``).
+ort_session = None
+
+# The fastai Resize settings preprocess_image reproduces; checkpoints exported
+# from a learner with any other settings are rejected at load time.
+SUPPORTED_RESIZE = {"method": "crop", "pad_mode": "reflection"}
+
+
+class AdaptiveConcatPool2d(nn.Module):
+    """FastAI's concat pooling: adaptive max and average pools, stacked on channels."""
+
+    def __init__(self, size=1):
+        super().__init__()
+        self.ap = nn.AdaptiveAvgPool2d(size)
+        self.mp = nn.AdaptiveMaxPool2d(size)
+
+    def forward(self, x):
+        return torch.cat([self.mp(x), self.ap(x)], 1)
+
+
+def build_model(n_classes: int) -> nn.Sequential:
+    """Rebuild the FastAI ``vision_learner`` ResNet-50 layout in plain PyTorch.
+
+    ``model[0]`` is the torchvision backbone without its pool/fc and
+    ``model[1]`` the default FastAI head, so the learner's ``state_dict``
+    keys line up one-to-one.
+    """
+    body = nn.Sequential(*list(resnet50(weights=None).children())[:-2])
+    head = nn.Sequential(
+        AdaptiveConcatPool2d(),
+        nn.Flatten(),
+        nn.BatchNorm1d(4096),
+        nn.Dropout(0.25),
+        nn.Linear(4096, 512, bias=False),
+        nn.ReLU(inplace=True),
+        nn.BatchNorm1d(512),
+        nn.Dropout(0.5),
+        nn.Linear(512, n_classes, bias=False),
+    )
+    return nn.Sequential(body, head)
 
 
 def _find_model() -> Path | None:
     """Search several likely locations for the model file."""
     candidates = [
-        MODEL_DIR / MODEL_FILENAME,                # models/export.pkl
-        Path(__file__).resolve().parent / MODEL_FILENAME,  # export.pkl (same dir)
+        MODEL_DIR / MODEL_FILENAME,                # models/resnet50_weights.pt
+        Path(__file__).resolve().parent / MODEL_FILENAME,  # resnet50_weights.pt (same dir)
     ]
     for p in candidates:
         if p.exists():
@@ -113,113 +134,257 @@ def _find_model() -> Path | None:
     return None
 
 
-def load_model() -> bool:
-    """Load (or reload) the FastAI learner.  Returns True on success.
+def _convert_learner() -> Path | None:
+    """Create the checkpoint from ``models/export.pkl`` in-process.
 
-    Uses ``torch.load`` directly instead of fastai's ``load_learner``
-    because the latter silently swallows ``ModuleNotFoundError`` when
-    the pickle references old module paths (e.g. ``plum.function``).
+    Only possible when fastai is installed (``requirements-export.txt``);
+    returns the checkpoint path, or None after explaining what is missing.
     """
-    global learn
-    model_path = _find_model()
-    if model_path is None:
+    pkl_path = MODEL_DIR / PKL_FILENAME
+    weights_path = MODEL_DIR / MODEL_FILENAME
+    if not pkl_path.exists() or importlib.util.find_spec("fastai") is None:
         print("[ERROR] Model file not found. Searched:")
-        print(f"        - {MODEL_DIR / MODEL_FILENAME}")
+        print(f"        - {weights_path}")
         print(f"        - {Path(__file__).resolve().parent / MODEL_FILENAME}")
+        print("        Install requirements-export.txt and run export_weights.py to")
+        print(f"        create it from {PKL_FILENAME} (or restart with fastai installed).")
+        return None
+
+    print(f"[INFO]  {MODEL_FILENAME} not found; converting {pkl_path} (one-off) ...")
+    try:
+        spec = importlib.util.spec_from_file_location(
+            "export_weights", Path(__file__).resolve().parent / "export_weights.py"
+        )
+        export_weights = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(export_weights)
+        export_weights.export(pkl_path, weights_path)
+        return weights_path
+    except Exception as exc:
+        import traceback
+        print(f"[ERROR] Converting {pkl_path} failed: {exc}")
+        traceback.print_exc()
+        return None
+
+
+def load_model() -> bool:
+    """Load (or reload) the model weights.  Returns True on success.
+
+    The checkpoint is produced from the FastAI ``export.pkl`` by
+    ``export_weights.py`` (run in-process here if it is missing and fastai is
+    installed); it holds only tensors and plain Python values, so it loads
+    with ``weights_only=True``.
+    """
+    global model, VOCAB, VOCAB_LIST, img_size, _scale, _shift, infer_model, ort_session
+    model_path = _find_model() or _convert_learner()
+    if model_path is None:
         return False
 
     try:
         print(f"[INFO]  Loading model from {model_path} ...")
-        # Direct torch.load — avoids the buggy error handling in
-        # fastai 2.8.x's load_learner which swallows ImportErrors.
-        res = torch.load(
-            model_path,
-            map_location="cpu",
-            pickle_module=pickle,
-            weights_only=False,
-        )
-        # Replicate what load_learner does after a successful load
-        res.dls.cpu()
-        if hasattr(res, "channels_last"):
-            res = res.to_contiguous(to_fp32=True)
-        elif hasattr(res, "mixed_precision"):
-            res = res.to_fp32()
-        elif hasattr(res, "non_native_mixed_precision"):
-            res = res.to_non_native_fp32()
-        learn = res
-        print(f"[INFO]  Model loaded successfully!  Classes: {learn.dls.vocab}")
+        ckpt = torch.load(model_path, map_location="cpu", weights_only=True)
+        for key, expected in SUPPORTED_RESIZE.items():
+            if ckpt.get(key) != expected:
+                raise ValueError(
+                    f"checkpoint has Resize {key}={ckpt.get(key)!r}, but preprocess_image "
+                    f"only implements {key}={expected!r}; re-run export_weights.py or "
+                    f"update preprocess_image"
+                )
+        VOCAB = tuple(ckpt["vocab"])
+        VOCAB_LIST = list(VOCAB)
+        net = build_model(len(VOCAB))
+        net.load_state_dict(ckpt["state_dict"])
+        # NHWC matches oneDNN's conv blocking on CPU
+        model = net.eval().to(memory_format=torch.channels_last)
+        img_size = tuple(ckpt["size"])
+        mean = torch.tensor(ckpt["mean"], dtype=torch.float64).view(-1, 1, 1)
+        std = torch.tensor(ckpt["std"], dtype=torch.float64).view(-1, 1, 1)
+        _scale = (1.0 / (255.0 * std)).float()
+        _shift = (mean / std).float()
+        infer_model = _build_inference_model(model)
+        ort_session = _load_onnx_session()
+        print(f"[INFO]  Model loaded successfully!  Classes: {VOCAB_LIST}")
         return True
     except Exception as exc:
         import traceback
         print(f"[ERROR] Failed to load model: {exc}")
         traceback.print_exc()
-        learn = None
+        model = None
+        infer_model = None
         return False
 
 
+def _build_inference_model(net):
+    """Return the module used for classification, per ``INFERENCE_DTYPE``."""
+    global _infer_input_dtype
+    if INFERENCE_DTYPE == "int8":
+        print("[INFO]  Using dynamic int8 quantisation for the classifier head")
+        _infer_input_dtype = torch.float32
+        return torch.ao.quantization.quantize_dynamic(net, {torch.nn.Linear}, dtype=torch.qint8)
+    if INFERENCE_DTYPE == "bf16":
+        print("[INFO]  Using bfloat16 weights for inference")
+        _infer_input_dtype = torch.bfloat16
+        return copy.deepcopy(net).to(torch.bfloat16).eval()
+    _infer_input_dtype = torch.float32
+    if USE_TORCHSCRIPT:
+        try:
+            scripted = torch.jit.optimize_for_inference(torch.jit.script(net))
+            print("[INFO]  Using TorchScript-optimised model for inference")
+            return scripted
+        except Exception as exc:
+            print(f"[WARN]  TorchScript optimisation failed, using eager model: {exc}")
+    return net
+
+
+def _load_onnx_session():
+    """Open the exported ONNX model with full graph optimisation, if available."""
+    if ort is None:
+        return None
+    for name in ONNX_FILENAMES:
+        path = MODEL_DIR / name
+        if path.exists():
+            opts = ort.SessionOptions()
+            opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            session = ort.InferenceSession(
+                str(path), sess_options=opts, providers=["CPUExecutionProvider"]
+            )
+            print(f"[INFO]  Using ONNX Runtime session from {path}")
+            return session
+    return None
+
+
+def predict_probs(batch):
+    """Class probabilities for a ``(N, C, H, W)`` batch of preprocessed images."""
+    if ort_session is not None:
+        logits = ort_session.run(None, {"input": batch.numpy()})[0]
+        return torch.from_numpy(logits).softmax(-1)
+    with torch.inference_mode():
+        batch = batch.to(dtype=_infer_input_dtype, memory_format=torch.channels_last)
+        return infer_model(batch).float().softmax(-1)
+
+
 # Attempt to load on startup
 load_model()
 
 
-# ── 6b. Grad-CAM helper ──────────────────────────────────────────────────────
-def generate_gradcam(learner, img_tensor, pred_idx):
-    """Generate a Grad-CAM heatmap for the predicted class.
+# ── 2b. Request batching ────────────────────────────────────────────────────
+# Concurrent requests are coalesced into a single forward pass: a background
+# thread drains up to MAX_BATCH queued tensors, waiting at most MAX_WAIT_MS
+# after the first one arrives, and resolves each request's Future.
+MAX_BATCH = int(os.environ.get("CERVICAL_MAX_BATCH", 16))
+MAX_WAIT_MS = float(os.environ.get("CERVICAL_MAX_WAIT_MS", 5))
+# A request gives up (HTTP 503) if its batch has not been scored by then
+CLASSIFY_TIMEOUT_S = float(os.environ.get("CERVICAL_CLASSIFY_TIMEOUT_S", 10))
+
+_request_queue = queue.Queue()
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def _batch_worker():
+    while True:
+        items = [_request_queue.get()]
+        deadline = time.monotonic() + MAX_WAIT_MS / 1000.0
+        while len(items) < MAX_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(_request_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        try:
+            probs = predict_probs(torch.stack([tensor for tensor, _ in items]))
+        except Exception as exc:
+            for _, future in items:
+                future.set_exception(exc)
+            continue
+        for (_, future), row in zip(items, probs):
+            future.set_result(row)
+
 
-    Hooks into the last convolutional block of the ResNet-50 backbone
-    (layer4) to capture activations and gradients, then produces a
-    heatmap overlaid on the original image.
+def classify(img_tensor):
+    """Queue one preprocessed ``(C, H, W)`` tensor and wait for its probabilities.
 
-    Returns a base64-encoded PNG string of the overlay.
+    Raises ``FutureTimeoutError`` if no result arrives within CLASSIFY_TIMEOUT_S.
     """
-    model = learner.model.eval()
+    global _batcher
+    # Started lazily so each (possibly forked) worker process gets its own
+    # thread, and restarted should it ever have died
+    if _batcher is None or not _batcher.is_alive():
+        with _batcher_lock:
+            if _batcher is None or not _batcher.is_alive():
+                _batcher = threading.Thread(target=_batch_worker, name="cervical-batcher", daemon=True)
+                _batcher.start()
+
+    future = Future()
+    _request_queue.put((img_tensor, future))
+    return future.result(timeout=CLASSIFY_TIMEOUT_S)
+
+
+# ── 2c. Preprocessing ───────────────────────────────────────────────────────
+def preprocess_image(img):
+    """Turn a PIL image into the normalised ``(C, H, W)`` tensor the model expects.
+
+    Mirrors the learner's validation-time transforms: ``Resize(method='crop')``
+    (centre crop to the target aspect ratio, bilinear resize), ``ToTensor``,
+    ``IntToFloatTensor`` and ``Normalize``.
+    """
+    w, h = img.size
+    tw, th = img_size
+    m = min(w / tw, h / th)
+    cw, ch = int(m * tw), int(m * th)
+    left, top = int(0.5 * (w - cw)), int(0.5 * (h - ch))
+    img = img.crop((left, top, left + cw, top + ch)).resize((tw, th), PILImageModule.BILINEAR)
 
-    # Identify the target layer — ResNet-50 inside FastAI has model[0] as body
-    # and model[1] as head.  model[0] is a Sequential whose last block is layer4.
-    body = model[0]
-    target_layer = body[-1]  # layer4
+    # The float conversion allocates a fresh tensor per request (it is queued
+    # for batching, so it cannot share a buffer); the rest runs in place.
+    x = torch.from_numpy(np.array(img, dtype=np.uint8)).permute(2, 0, 1).float()
+    return x.mul_(_scale).sub_(_shift)
 
-    activations = []
-    gradients = []
 
-    def forward_hook(module, inp, out):
-        activations.append(out.detach())
+# ── 2d. Grad-CAM helper ──────────────────────────────────────────────────────
+def generate_gradcam(net, img_tensor, pred_idx):
+    """Generate a Grad-CAM heatmap for the predicted class.
 
-    def backward_hook(module, grad_in, grad_out):
-        gradients.append(grad_out[0].detach())
+    Runs the ResNet-50 body (ending in layer4) and the head as two explicit
+    steps and takes the gradient of the class score with respect to the
+    layer4 activations via ``torch.autograd.grad``.  No hooks are registered
+    and no parameter ``.grad`` is touched, so concurrent requests (gthread
+    workers, the batcher thread running the same eager module) cannot see
+    each other's activations.
 
-    fh = target_layer.register_forward_hook(forward_hook)
-    bh = target_layer.register_full_backward_hook(backward_hook)
+    Returns the heatmap as a float array in [0, 1].
+    """
+    net = net.eval()
 
-    try:
-        # Forward pass
-        img_batch = img_tensor.unsqueeze(0)  # (1, C, H, W)
-        output = model(img_batch)
+    # The FastAI ResNet-50 layout has model[0] as body (last block: layer4)
+    # and model[1] as head.
+    body, head = net[0], net[1]
 
-        # Backward pass for the predicted class
-        model.zero_grad()
-        target_score = output[0, pred_idx]
-        target_score.backward()
+    with torch.enable_grad():
+        img_batch = img_tensor.unsqueeze(0)  # (1, C, H, W)
+        acts = body(img_batch)               # (1, C, h, w) layer4 output
+        output = head(acts)
 
-        # Compute Grad-CAM weights
-        grads = gradients[0]        # (1, C, H, W)
-        acts = activations[0]       # (1, C, H, W)
-        weights = grads.mean(dim=(2, 3), keepdim=True)  # GAP over spatial dims
-        cam = (weights * acts).sum(dim=1, keepdim=True)  # weighted combination
-        cam = F.relu(cam)           # ReLU to keep positive contributions
-        cam = cam.squeeze().cpu().numpy()
+        # Gradient of the predicted class score w.r.t. the layer4 activations
+        (grads,) = torch.autograd.grad(output[0, pred_idx], acts)
 
-        # Normalize to [0, 1]
-        cam_min, cam_max = cam.min(), cam.max()
-        if cam_max - cam_min > 1e-8:
-            cam = (cam - cam_min) / (cam_max - cam_min)
-        else:
-            cam = np.zeros_like(cam)
+    # Compute Grad-CAM weights
+    acts = acts.detach()
+    weights = grads.mean(dim=(2, 3), keepdim=True)  # GAP over spatial dims
+    cam = (weights * acts).sum(dim=1, keepdim=True)  # weighted combination
+    cam = F.relu(cam)           # ReLU to keep positive contributions
+    cam = cam.squeeze().cpu().numpy()
 
-        return cam
+    # Normalize to [0, 1]
+    cam_min, cam_max = cam.min(), cam.max()
+    if cam_max - cam_min > 1e-8:
+        cam = (cam - cam_min) / (cam_max - cam_min)
+    else:
+        cam = np.zeros_like(cam)
 
-    finally:
-        fh.remove()
-        bh.remove()
+    return cam
 
 
 def overlay_gradcam(original_pil_img, cam, alpha=0.5):
@@ -249,16 +414,22 @@ def overlay_gradcam(original_pil_img, cam, alpha=0.5):
     return base64.b64encode(buf.read()).decode("utf-8")
 
 
-# ── 7. Routes ────────────────────────────────────────────────────────────────
+# ── 3. Routes ────────────────────────────────────────────────────────────────
+def json_response(payload, status=200):
+    """``jsonify`` replacement that encodes with orjson when it is installed."""
+    if orjson is None:
+        return jsonify(payload), status
+    body = orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return app.response_class(body, status=status, mimetype="application/json")
 
 
 @app.route("/health", methods=["GET"])
 def health():
     """Liveness / readiness probe."""
-    return jsonify({
-        "status": "healthy" if learn is not None else "model_not_loaded",
-        "model_loaded": learn is not None,
-        "model_classes": list(learn.dls.vocab) if learn else [],
+    return json_response({
+        "status": "healthy" if model is not None else "model_not_loaded",
+        "model_loaded": model is not None,
+        "model_classes": VOCAB_LIST,
     })
 
 
@@ -280,51 +451,45 @@ def predict_cervical():
     Returns (4xx / 5xx):
         { "error": "description of problem" }
     """
-    global learn
-
     # ── Guard: model must be available ──
-    if learn is None:
+    if model is None:
         if not load_model():
-            return jsonify({"error": "Model not found or failed to load. Check server logs."}), 500
+            return json_response({"error": "Model not found or failed to load. Check server logs."}, 500)
 
     # ── Guard: file must be present ──
     if "file" not in request.files:
-        return jsonify({"error": "No file uploaded. Include a 'file' field in form-data."}), 400
+        return json_response({"error": "No file uploaded. Include a 'file' field in form-data."}, 400)
 
     file = request.files["file"]
     if file.filename == "":
-        return jsonify({"error": "Empty filename — no file was selected."}), 400
+        return json_response({"error": "Empty filename — no file was selected."}, 400)
 
     # ── Allowed extensions check ──
     ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png", "bmp", "tif", "tiff"}
     ext = file.filename.rsplit(".", 1)[-1].lower() if "." in file.filename else ""
     if ext not in ALLOWED_EXTENSIONS:
-        return jsonify({
+        return json_response({
             "error": f"Unsupported file type '.{ext}'. Accepted: {', '.join(sorted(ALLOWED_EXTENSIONS))}"
-        }), 400
+        }, 400)
 
     # ── Inference ──
     try:
-        img = PILImage.create(file.stream)
-        pred, pred_idx, probs = learn.predict(img)
+        img = PILImageModule.open(file.stream).convert("RGB")
+        img_tensor = preprocess_image(img)  # (C, H, W)
 
-        # Build per-class probability map
-        class_probs = {
-            cls: round(float(probs[i]), 4)
-            for i, cls in enumerate(learn.dls.vocab)
-        }
+        probs = classify(img_tensor)
+        pred_idx = int(probs.argmax())
+        pred = VOCAB[pred_idx]
+
+        # Build per-class probability map (rounded in float64, like round(float(p), 4))
+        probs_np = probs.double().numpy().round(4)
+        class_probs = dict(zip(VOCAB, probs_np.tolist()))
 
         # ── Grad-CAM visualization ──
         gradcam_b64 = None
         try:
-            # Get the processed tensor that FastAI used for prediction
-            dl = learn.dls.test_dl([img])
-            img_tensor = next(iter(dl))[0].squeeze(0)  # (C, H, W)
-
-            cam = generate_gradcam(learn, img_tensor, int(pred_idx))
-            # Convert FastAI PILImage to standard PIL for overlay
-            original_pil = PILImageModule.fromarray(np.array(img))
-            gradcam_b64 = overlay_gradcam(original_pil, cam)
+            cam = generate_gradcam(model, img_tensor, pred_idx)
+            gradcam_b64 = overlay_gradcam(img, cam)
             print("[INFO]  Grad-CAM generated successfully")
         except Exception as cam_exc:
             print(f"[WARN]  Grad-CAM generation failed (non-fatal): {cam_exc}")
@@ -333,21 +498,25 @@ def predict_cervical():
 
         response_data = {
             "prediction":  str(pred),
-            "confidence":  round(float(probs[pred_idx]), 4),
-            "classes":     list(learn.dls.vocab),
+            "confidence":  float(probs_np[pred_idx]),
+            "classes":     VOCAB_LIST,
             "class_probabilities": class_probs,
         }
         if gradcam_b64:
             response_data["gradcam"] = gradcam_b64
 
-        return jsonify(response_data)
+        return json_response(response_data)
+
+    except FutureTimeoutError:
+        print(f"[ERROR] Classification timed out after {CLASSIFY_TIMEOUT_S}s")
+        return json_response({"error": "Prediction timed out; please retry."}, 503)
 
     except Exception as exc:
         print(f"[ERROR] Prediction failed: {exc}")
-        return jsonify({"error": f"Prediction failed: {str(exc)}"}), 500
+        return json_response({"error": f"Prediction failed: {str(exc)}"}, 500)
 
 
-# ── 8. Entry-point ───────────────────────────────────────────────────────────
+# ── 4. Entry-point ───────────────────────────────────────────────────────────
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5009))
     print(f"[INFO]  Starting Cervical Cancer Detection API on port {port}")
@@ -7,13 +7,37 @@ Endpoints: /health, /model-info, /predict/uterine-tcga
 import os
 import json
 import traceback
+import warnings
+from functools import lru_cache
 
 import joblib
 import numpy as np
-import pandas as pd
-import shap
+import xgboost as xgb
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson  # optional, faster JSON encoding
+except ImportError:
+    orjson = None
+
+try:
+    import tl2cgen  # optional: Treelite-compiled models (see compile_treelite.py)
+except ImportError:
+    tl2cgen = None
+
+# Opt-in JIT for the per-row MSI merge / reorder kernel.  Importing numba costs
+# ~0.3 s and ~80 MB per process for a few microseconds per request, so the
+# NumPy path is the default.
+numba = None
+if os.environ.get("TCGA_NUMBA", "0") == "1":
+    try:
+        import numba
+    except ImportError:
+        print("[WARN]  TCGA_NUMBA=1 but numba is not installed; using NumPy.")
+
+shap = None  # imported on first use by _load_shap(); it is slow and memory-heavy
 
 # ──────────────────────────────────────────────
 #  Paths & Artefact Loading
@@ -22,17 +46,34 @@ from flask_cors import CORS
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODELS_DIR = os.path.join(BASE_DIR, "model_artifacts")
 
-# Load models and transformers
-task_a_model = joblib.load(os.path.join(MODELS_DIR, "task_a_best_model.joblib"))
-task_b_model = joblib.load(os.path.join(MODELS_DIR, "task_b_primary_best_model.joblib"))
+# Load models and transformers.  Arrays are memory-mapped read-only, so
+# preloaded gunicorn workers share the file-backed pages.
+task_a_model = joblib.load(os.path.join(MODELS_DIR, "task_a_best_model.joblib"), mmap_mode="r")
+task_b_model = joblib.load(os.path.join(MODELS_DIR, "task_b_primary_best_model.joblib"), mmap_mode="r")
+
+imputer_a = joblib.load(os.path.join(MODELS_DIR, "imputer_task_a.joblib"), mmap_mode="r")
+scaler_a = joblib.load(os.path.join(MODELS_DIR, "scaler_task_a.joblib"), mmap_mode="r")
+
+imputer_b = joblib.load(os.path.join(MODELS_DIR, "imputer_task_b_primary.joblib"), mmap_mode="r")
+scaler_b = joblib.load(os.path.join(MODELS_DIR, "scaler_task_b_primary.joblib"), mmap_mode="r")
 
-imputer_a = joblib.load(os.path.join(MODELS_DIR, "imputer_task_a.joblib"))
-scaler_a = joblib.load(os.path.join(MODELS_DIR, "scaler_task_a.joblib"))
+label_encoder_a = joblib.load(os.path.join(MODELS_DIR, "label_encoder_subtype.joblib"), mmap_mode="r")
 
-imputer_b = joblib.load(os.path.join(MODELS_DIR, "imputer_task_b_primary.joblib"))
-scaler_b = joblib.load(os.path.join(MODELS_DIR, "scaler_task_b_primary.joblib"))
+# Treelite-compiled versions of the two tree models, if compile_treelite.py has
+# been run.  Single-row scoring then skips the Python/DMatrix overhead.
+TASK_A_LIB = os.path.join(MODELS_DIR, "task_a.so")
+TASK_B_LIB = os.path.join(MODELS_DIR, "task_b.so")
 
-label_encoder_a = joblib.load(os.path.join(MODELS_DIR, "label_encoder_subtype.joblib"))
+
+def _load_predictor(libpath):
+    if tl2cgen is None or not os.path.exists(libpath):
+        return None
+    print(f"[INFO]  Using Treelite-compiled model from {libpath}")
+    return tl2cgen.Predictor(libpath, nthread=1)
+
+
+predictor_a = _load_predictor(TASK_A_LIB)
+predictor_b = _load_predictor(TASK_B_LIB)
 
 # ──────────────────────────────────────────────
 #  Pipeline Feature Definitions
@@ -69,94 +110,210 @@ PIPELINE_FEATURES = [
 ]
 # Note: Baseline is "American Indian or Alaska Native" which is dropped.
 
+# Column order fed to both models after the MSI merge
+FINAL_FEATURES = [
+    "Mutation Count",
+    "Fraction Genome Altered",
+    "Diagnosis Age",
+    "Race Category_Asian",
+    "Race Category_Black or African American",
+    "Race Category_Native Hawaiian or Other Pacific Islander",
+    "Race Category_White",
+    "MSI_PC1"
+]
+
+# Integer positions into the PIPELINE_FEATURES row
+NUMERIC_IDX = [
+    ("mutation_count", 0),
+    ("fraction_genome_altered", 1),
+    ("diagnosis_age", 2),
+    ("msi_mantis_score", 3),
+    ("msisensor_score", 4),
+]
+RACE_IDX = {
+    col[len("Race Category_"):]: i
+    for i, col in enumerate(PIPELINE_FEATURES) if col.startswith("Race Category_")
+}
+MSI_IDX = (3, 4)
+FINAL_ORDER_IDX = np.array([0, 1, 2, 5, 6, 7, 8], dtype=np.intp)
+
+# The imputers/scalers were fitted on DataFrames; they are fed ndarrays here.
+warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+
 # ──────────────────────────────────────────────
 #  Preprocessing Helper
 # ──────────────────────────────────────────────
 
-def preprocess_input(data: dict) -> pd.DataFrame:
-    """Replicate the exact training pipeline: 1-hot encode, impute, scale, PCA merge."""
-    
-    # 1. Build dictionary for DataFrame (numeric + all OHE columns default to 0)
-    row = {
-        "Mutation Count": float(data.get("mutation_count", 0)),
-        "Fraction Genome Altered": float(data.get("fraction_genome_altered", 0)),
-        "Diagnosis Age": float(data.get("diagnosis_age", 0)),
-        "MSI MANTIS Score": float(data.get("msi_mantis_score", 0)),
-        "MSIsensor Score": float(data.get("msisensor_score", 0)),
-        "Race Category_Asian": 0.0,
-        "Race Category_Black or African American": 0.0,
-        "Race Category_Native Hawaiian or Other Pacific Islander": 0.0,
-        "Race Category_White": 0.0,
-    }
-
-    # 2. Assign the actual one-hot encoded race value
-    race = data.get("race_category", "")
-    ohe_col = f"Race Category_{race}"
-    if ohe_col in row:
-        row[ohe_col] = 1.0
-
-    # 3. Create DataFrame in EXACT order
-    df = pd.DataFrame([row])[PIPELINE_FEATURES]
-    return df
-
-
-def transform_and_pca(df: pd.DataFrame, imputer, scaler) -> pd.DataFrame:
-    """Impute, Scale, and Merge MSI features via PCA-simulated averaging."""
-    # Impute
-    imputed_array = imputer.transform(df)
-    df_imputed = pd.DataFrame(imputed_array, columns=PIPELINE_FEATURES)
-    
-    # Scale
-    scaled_array = scaler.transform(df_imputed)
-    df_scaled = pd.DataFrame(scaled_array, columns=PIPELINE_FEATURES)
-    
-    # Simulate the PCA merge
-    msi_mantis = df_scaled["MSI MANTIS Score"]
-    msisensor = df_scaled["MSIsensor Score"]
-    df_scaled["MSI_PC1"] = (msi_mantis + msisensor) / 2.0
-    
-    # Drop original MSI cols
-    df_final = df_scaled.drop(columns=["MSI MANTIS Score", "MSIsensor Score"])
-    
-    # Ensure correct column order for model
-    final_cols = [
-        "Mutation Count",
-        "Fraction Genome Altered",
-        "Diagnosis Age",
-        "Race Category_Asian",
-        "Race Category_Black or African American",
-        "Race Category_Native Hawaiian or Other Pacific Islander",
-        "Race Category_White",
-        "MSI_PC1"
-    ]
-    return df_final[final_cols]
+def preprocess_input(data: dict) -> np.ndarray:
+    """Build the (1, 9) one-hot encoded row in PIPELINE_FEATURES order."""
+    x = np.zeros((1, len(PIPELINE_FEATURES)), dtype=np.float64)
+    for field, i in NUMERIC_IDX:
+        x[0, i] = float(data.get(field, 0))
+
+    # Baseline race ("American Indian or Alaska Native") and unknowns stay all-zero;
+    # str() keeps non-string input (lists, dicts) a plain non-match
+    race_i = RACE_IDX.get(str(data.get("race_category", "")))
+    if race_i is not None:
+        x[0, race_i] = 1.0
+    return x
+
+
+def _fuse_affine(imputer, scaler):
+    """Fold a fitted SimpleImputer + StandardScaler into ``(fill, mean, scale)``.
+
+    ``(where(isnan(x), fill, x) - mean) / scale`` performs exactly the same
+    arithmetic as ``scaler.transform(imputer.transform(x))`` without the sklearn
+    validation overhead.  Returns None for configurations this does not cover.
+    """
+    missing = imputer.missing_values
+    if imputer.add_indicator or not (isinstance(missing, float) and np.isnan(missing)):
+        return None
+    fill = np.asarray(imputer.statistics_, dtype=np.float64)
+    if np.isnan(fill).any():  # all-missing columns would be dropped by the imputer
+        return None
+    mean = scaler.mean_ if scaler.with_mean else np.zeros_like(fill)
+    scale = scaler.scale_ if scaler.with_std else np.ones_like(fill)
+    return fill, mean, scale
+
+
+AFFINE_A = _fuse_affine(imputer_a, scaler_a)
+AFFINE_B = _fuse_affine(imputer_b, scaler_b)
+
+
+def _pca_reorder(x_scaled, order_idx, msi_a, msi_b):
+    """FINAL_FEATURES row from one imputed + scaled row.
+
+    Picks ``order_idx`` and appends the mean of the two MSI scores (MSI_PC1).
+    """
+    n = order_idx.shape[0]
+    out = np.empty(n + 1)
+    for j in range(n):
+        out[j] = x_scaled[order_idx[j]]
+    out[n] = (x_scaled[msi_a] + x_scaled[msi_b]) / 2.0
+    return out
+
+
+if numba is not None:
+    _pca_reorder = numba.njit(cache=True)(_pca_reorder)
+    # Compile at import so the first request does not pay for it
+    _pca_reorder(np.zeros(len(PIPELINE_FEATURES)), FINAL_ORDER_IDX, *MSI_IDX)
+
+
+def transform_and_pca(x: np.ndarray, imputer, scaler, affine=None) -> np.ndarray:
+    """Impute, Scale, and Merge MSI features via PCA-simulated averaging.
+
+    Uses the fused ``affine`` from ``_fuse_affine`` when given.  Returns a
+    (1, 8) row in FINAL_FEATURES order.
+    """
+    if affine is None:
+        x = scaler.transform(imputer.transform(x))
+    else:
+        if np.isinf(x).any():  # sklearn's input validation rejects these too
+            raise ValueError("Input X contains infinity or a value too large for dtype('float64').")
+        fill, mean, scale = affine
+        x = (np.where(np.isnan(x), fill, x) - mean) / scale
+    if numba is None:
+        msi_pc1 = (x[0, MSI_IDX[0]] + x[0, MSI_IDX[1]]) / 2.0
+        return np.append(x[0, FINAL_ORDER_IDX], msi_pc1).reshape(1, -1)
+    return _pca_reorder(x[0], FINAL_ORDER_IDX, *MSI_IDX).reshape(1, -1)
+
+
+# ──────────────────────────────────────────────
+#  Model Scoring
+# ──────────────────────────────────────────────
+
+def predict_subtype_proba(X) -> np.ndarray:
+    """Task A class probabilities for a single row."""
+    if predictor_a is None:
+        return task_a_model.predict_proba(X)[0]
+    # sklearn trees compare float32-cast inputs against float64 thresholds
+    x = np.asarray(X, dtype=np.float32).astype(np.float64)
+    return predictor_a.predict(tl2cgen.DMatrix(x)).reshape(-1)
+
+
+def predict_survival_proba(X) -> float:
+    """Task B probability of the positive (deceased) class for a single row."""
+    if predictor_b is None:
+        return float(task_b_model.predict_proba(X)[0][1])
+    x = np.asarray(X, dtype=np.float32)
+    return float(predictor_b.predict(tl2cgen.DMatrix(x)).reshape(-1)[0])
 
 
 # ──────────────────────────────────────────────
 #  SHAP Explainer
 # ──────────────────────────────────────────────
 
-def _compute_shap(model, X_df, is_tree=True, top_n=5) -> list:
+def _load_shap():
+    """Import SHAP on first use so startup and /health never pay for it."""
+    global shap
+    if shap is None:
+        import shap as _shap
+        shap = _shap
+    return shap
+
+
+def _build_explainer(model):
+    """Create a TreeExplainer; None if SHAP cannot parse the model."""
+    try:
+        return _load_shap().TreeExplainer(model)
+    except Exception as e:
+        print(f"[SHAP WARNING] Could not build TreeExplainer: {e}")
+        return None
+
+
+# TreeExplainers are built on first use and reused.  XGBoost models never
+# need one: they are explained with the booster's native TreeSHAP instead.
+_EXPLAINERS = {}
+
+
+def _get_explainer(model):
+    key = id(model)
+    if key not in _EXPLAINERS:
+        _EXPLAINERS[key] = _build_explainer(model)
+    return _EXPLAINERS[key]
+
+
+def _top_indices(magnitudes: np.ndarray, top_n: int) -> np.ndarray:
+    """Indices of the ``top_n`` largest magnitudes, largest first.
+
+    Same result as a stable descending sort truncated to ``top_n`` (ties keep
+    feature order), but selects with a partial partition instead of sorting.
+    """
+    top_n = min(top_n, magnitudes.size)
+    if top_n <= 0:
+        return np.empty(0, dtype=np.intp)
+    kth = np.partition(magnitudes, -top_n)[-top_n]
+    above = np.flatnonzero(magnitudes > kth)
+    ties = np.flatnonzero(magnitudes == kth)[: top_n - above.size]
+    idx = np.concatenate([above, ties])
+    return idx[np.argsort(-magnitudes[idx], kind="stable")]
+
+
+def _compute_shap(model, X, feature_names=FINAL_FEATURES, is_tree=True, top_n=5) -> list:
     """Compute per-prediction SHAP explanations."""
     try:
-        # For tree-based models (Random Forest, XGBoost)
-        explainer = shap.TreeExplainer(model)
-        shap_values = explainer.shap_values(X_df)
-        
-        # XGBoost returns standard array, RandomForest returns list of arrays per class
-        if isinstance(shap_values, list):
-            sv = shap_values[1] # Take positive class or main class
+        if isinstance(model, xgb.XGBModel):
+            # One native TreeSHAP pass; the last column is the bias term
+            dmatrix = xgb.DMatrix(X, feature_names=list(feature_names))
+            values = model.get_booster().predict(dmatrix, pred_contribs=True)[0, :-1]
         else:
-            sv = shap_values
-            
-        values = sv[0] if sv.ndim == 2 else sv
-        
-        feature_names = X_df.columns.tolist()
-        pairs = list(zip(feature_names, values))
-        
-        # Sort by absolute magnitude
-        pairs.sort(key=lambda x: abs(x[1]), reverse=True)
-        top = pairs[:top_n]
+            explainer = _get_explainer(model)
+            if explainer is None:
+                raise RuntimeError("no TreeExplainer available for this model")
+            shap_values = explainer.shap_values(X, check_additivity=False)
+
+            # RandomForest returns list of arrays per class
+            if isinstance(shap_values, list):
+                sv = shap_values[1] # Take positive class or main class
+            else:
+                sv = shap_values
+
+            values = sv[0] if sv.ndim == 2 else sv
+
+        # Top N by absolute magnitude
+        idx = _top_indices(np.abs(values), top_n)
+        rounded = np.round(np.asarray(values, dtype=np.float64)[idx], 4).tolist()
+        top = [(feature_names[i], val) for i, val in zip(idx, rounded)]
         
         # Clean up names for frontend
         name_map = {
@@ -172,7 +329,7 @@ def _compute_shap(model, X_df, is_tree=True, top_n=5) -> list:
         return [
             {
                 "feature": name_map.get(name, name.replace("Race Category_", "Race (") + ")"),
-                "shap_value": round(float(val), 4),
+                "shap_value": val,
                 "direction": "increases risk" if val > 0 else "decreases risk"
             }
             for name, val in top
@@ -183,7 +340,6 @@ def _compute_shap(model, X_df, is_tree=True, top_n=5) -> list:
         try:
             # Fallback to XGBoost global feature importances
             importances = model.feature_importances_
-            feature_names = X_df.columns.tolist()
             pairs = list(zip(feature_names, importances))
             
             # Sort by absolute magnitude
@@ -203,7 +359,7 @@ def _compute_shap(model, X_df, is_tree=True, top_n=5) -> list:
             # Since global importances are always positive, we guess the direction
             # based on the overall survival prediction risk. If probability > 0.5, 
             # we classify top features as increasing risk. Otherwise decreasing.
-            prob = model.predict_proba(X_df)[0][1]
+            prob = model.predict_proba(X)[0][1]
             direction = "increases risk" if prob >= 0.5 else "decreases risk"
             
             return [
@@ -218,11 +374,46 @@ def _compute_shap(model, X_df, is_tree=True, top_n=5) -> list:
             print(f"[SHAP FALLBACK FAILED]: {fallback_err}")
             return []
 
+# ──────────────────────────────────────────────
+#  Inference
+# ──────────────────────────────────────────────
+
+@lru_cache(maxsize=4096)
+def run_inference(key: bytes):
+    """Subtype probabilities, survival probability and SHAP explanation.
+
+    Keyed on the raw bytes of the (1, 9) float64 row from ``preprocess_input``,
+    so repeated inputs skip both transforms, both models and SHAP.
+    """
+    x_raw = np.frombuffer(key, dtype=np.float64).reshape(1, -1)
+
+    # Task A (Subtype) / Task B (Survival) Transformations
+    X_a = transform_and_pca(x_raw, imputer_a, scaler_a, AFFINE_A)
+    X_b = transform_and_pca(x_raw, imputer_b, scaler_b, AFFINE_B)
+
+    proba_a = predict_subtype_proba(X_a)
+    # 1 = Deceased, 0 = Living
+    proba_b = predict_survival_proba(X_b)
+
+    # Using Survival model for risk explanation as it maps directly to "increases/decreases risk"
+    shap_explanation = _compute_shap(task_b_model, X_b, top_n=5)
+    return proba_a, proba_b, shap_explanation
+
+
 # ──────────────────────────────────────────────
 #  Flask Application
 # ──────────────────────────────────────────────
 
+class ORJSONProvider(DefaultJSONProvider):
+    """``jsonify`` backend using orjson; keys are sorted like Flask's default."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_SORT_KEYS).decode()
+
+
 app = Flask(__name__)
+if orjson is not None:
+    app.json = ORJSONProvider(app)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
 @app.route("/health", methods=["GET"])
@@ -254,30 +445,22 @@ def predict():
         if missing:
             return jsonify({"error": f"Missing fields: {', '.join(missing)}"}), 400
 
-        # ---- Preprocess ----
-        df_raw = preprocess_input(data)
-        
-        # Task A (Subtype) Transformation
-        X_a = transform_and_pca(df_raw, imputer_a, scaler_a)
-        
-        # Task B (Survival) Transformation
-        X_b = transform_and_pca(df_raw, imputer_b, scaler_b)
+        # ---- Preprocess + both models + SHAP (memoised per input row) ----
+        x_raw = preprocess_input(data)
+        proba_a, proba_b, shap_explanation = run_inference(x_raw.tobytes())
         
         # ---- Task A: Subtype Prediction ----
-        pred_a_encoded = task_a_model.predict(X_a)[0]
-        proba_a = task_a_model.predict_proba(X_a)[0]
+        pred_a_encoded = task_a_model.classes_[np.argmax(proba_a)]
         
         subtype_name = label_encoder_a.inverse_transform([pred_a_encoded])[0]
-        max_conf = float(np.max(proba_a))
-        
-        class_probs = {
-            cls_name: float(prob)
-            for cls_name, prob in zip(label_encoder_a.classes_, proba_a)
-        }
+
+        # Round every response probability in one vectorised call
+        rounded = np.round(np.append(proba_a, proba_b), 4).tolist()
+        class_probs = dict(zip(label_encoder_a.classes_, rounded[:-1]))
+        max_conf = max(rounded[:-1])
+        proba_b_rounded = rounded[-1]
         
         # ---- Task B: Survival Prediction ----
-        # 1 = Deceased, 0 = Living
-        proba_b = task_b_model.predict_proba(X_b)[0][1]
         survival_pred = "DECEASED" if proba_b >= 0.5 else "LIVING"
         
         # Stratify risk roughly (Low < 0.3, Int 0.3-0.7, High >= 0.7)
@@ -287,21 +470,17 @@ def predict():
             s_risk_tier = "High"
         else:
             s_risk_tier = "Intermediate"
-            
-        # ---- SHAP Explainability ----
-        # Using Survival model for risk explanation as it maps directly to "increases/decreases risk"
-        shap_explanation = _compute_shap(task_b_model, X_b, top_n=5)
 
         # ---- Response ----
         return jsonify({
             "subtype": {
                 "prediction": subtype_name,
-                "confidence": round(max_conf, 4),
+                "confidence": max_conf,
                 "probabilities": class_probs
             },
             "survival": {
                 "prediction": survival_pred,
-                "probability_deceased": round(float(proba_b), 4),
+                "probability_deceased": proba_b_rounded,
                 "risk_tier": s_risk_tier
             },
             "shap_explanation": shap_explanation,
@@ -318,4 +497,4 @@ if __name__ == "__main__":
     print("  Uterine Cancer TCGA Molecular API")
     print("  Port: 5008")
     print("=" * 60)
-    app.run(host="0.0.0.0", port=5008, debug=True)
+    app.run(host="0.0.0.0", port=5008)
@@ -0,0 +1,55 @@
+"""Compile the TCGA tree models with Treelite.
+
+Produces ``model_artifacts/task_a.so`` (Random Forest, subtype) and
+``model_artifacts/task_b.so`` (XGBoost, survival), which ``app.py`` loads at
+startup (when ``tl2cgen`` is installed) in place of the Python predictors.
+Re-run after every retrain.
+
+    python compile_treelite.py [--quantize]
+
+``--quantize`` compiles the split thresholds as integer bin indices (the
+input is mapped to bins once per row).  Predictions are identical; it trades
+a per-row binning step for a smaller, more cache-friendly tree layout, so it
+only pays off for large batches or cache-cold workloads.
+"""
+
+import argparse
+import os
+
+import joblib
+import treelite
+import tl2cgen
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "model_artifacts")
+TASK_A_LIB = os.path.join(MODELS_DIR, "task_a.so")
+TASK_B_LIB = os.path.join(MODELS_DIR, "task_b.so")
+
+
+def _export(tl_model, libpath, quantize=False):
+    print(f"[INFO]  Compiling to {libpath} ...")
+    params = {"parallel_comp": os.cpu_count() or 4}
+    if quantize:
+        params["quantize"] = 1
+    tl2cgen.export_lib(tl_model, toolchain="gcc", libpath=libpath, params=params)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quantize", action="store_true",
+                        help="compile thresholds as integer bin indices")
+    args = parser.parse_args()
+
+    task_a_model = joblib.load(os.path.join(MODELS_DIR, "task_a_best_model.joblib"))
+    task_b_model = joblib.load(os.path.join(MODELS_DIR, "task_b_primary_best_model.joblib"))
+
+    print("[INFO]  Converting Random Forest (Task A) to Treelite ...")
+    _export(treelite.sklearn.import_model(task_a_model), TASK_A_LIB, args.quantize)
+
+    print("[INFO]  Converting XGBoost booster (Task B) to Treelite ...")
+    _export(treelite.frontend.from_xgboost(task_b_model.get_booster()), TASK_B_LIB, args.quantize)
+    print("[INFO]  Done")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,18 @@
-import joblib
-import pandas as pd
-import shap
+"""
+Dev-only check that SHAP's TreeExplainer can handle the Task B booster.
+
+Not used by app.py; run it by hand:
+
+    python debug_shap.py
+"""
+
+import os
 import traceback
 
-print("Loading Task B model...")
-model = joblib.load("model_artifacts/task_b_primary_best_model.joblib")
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "model_artifacts", "task_b_primary_best_model.joblib")
 
-cols = [
+COLS = [
     "Mutation Count",
     "Fraction Genome Altered",
     "Diagnosis Age",
@@ -16,18 +22,34 @@ cols = [
     "Race Category_White",
     "MSI_PC1"
 ]
-df = pd.DataFrame([[0]*8], columns=cols)
-
-try:
-    print("Modifying booster...")
-    booster = model.get_booster()
-    booster.set_param({"base_score": 0.5})
-    
-    print("Initializing Explainer...")
-    explainer = shap.TreeExplainer(booster)
-    print("Computing shap values...")
-    shap_values = explainer.shap_values(df)
-    print("Success")
-    print(shap_values)
-except Exception as e:
-    print(f"Error computing SHAP: {repr(e)}")
+
+
+def main():
+    # Heavy imports stay here so importing this module has no side effects
+    import joblib
+    import pandas as pd
+    import shap
+
+    print("Loading Task B model...")
+    model = joblib.load(MODEL_PATH)
+
+    df = pd.DataFrame([[0]*8], columns=COLS)
+
+    try:
+        print("Modifying booster...")
+        booster = model.get_booster()
+        booster.set_param({"base_score": 0.5})
+
+        print("Initializing Explainer...")
+        explainer = shap.TreeExplainer(booster)
+        print("Computing shap values...")
+        shap_values = explainer.shap_values(df)
+        print("Success")
+        print(shap_values)
+    except Exception as e:
+        print(f"Error computing SHAP: {repr(e)}")
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    main()
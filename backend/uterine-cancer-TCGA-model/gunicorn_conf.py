@@ -0,0 +1,33 @@
+"""
+Gunicorn configuration for the uterine TCGA molecular API.
+
+    gunicorn -c gunicorn_conf.py app:app
+
+The app is preloaded so the models, transformers and Treelite predictors are
+loaded once in the master and shared with the workers via copy-on-write fork.
+SHAP is not part of that: any TreeExplainer a model needs is built lazily in
+each worker on first use.
+"""
+
+import gc
+import os
+
+# One OpenMP thread per worker for XGBoost; must be set before it is imported.
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5008)}"
+preload_app = True
+workers = int(os.environ.get("WEB_CONCURRENCY", max(2, (os.cpu_count() or 2) // 2)))
+worker_class = "gthread"
+threads = 4
+timeout = 60
+
+
+def when_ready(server):
+    # Runs in the master after the preloaded app is imported and before any
+    # worker is forked.  Moving every live object into the permanent GC
+    # generation stops the workers' collector from writing to their headers,
+    # so the pages holding the models and transformers stay shared instead of
+    # being copied into each worker over time.
+    gc.collect()
+    gc.freeze()
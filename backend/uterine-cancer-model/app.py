@@ -6,14 +6,27 @@ Endpoints: /health, /model-info, /predict/uterine
 
 import os
 import json
+import queue
+import threading
+import time
 import traceback
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from functools import lru_cache
 
 import joblib
 import numpy as np
 import pandas as pd
-import shap
+from scipy.special import expit
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson  # optional, faster JSON encoding
+except ImportError:
+    orjson = None
+
+shap = None  # imported on first use by _load_shap(); it is slow and memory-heavy
 
 # ──────────────────────────────────────────────
 #  Paths
@@ -30,8 +43,9 @@ THRESHOLDS_PATH = os.path.join(MODELS_DIR, "risk_stratification_thresholds.json"
 #  Load artefacts at startup
 # ──────────────────────────────────────────────
 
-model = joblib.load(MODEL_PATH)
-pipeline = joblib.load(PIPELINE_PATH)
+# Arrays are memory-mapped read-only and shared across gunicorn workers
+model = joblib.load(MODEL_PATH, mmap_mode="r")
+pipeline = joblib.load(PIPELINE_PATH, mmap_mode="r")
 
 with open(THRESHOLDS_PATH, "r") as f:
     thresholds_data = json.load(f)
@@ -59,6 +73,51 @@ BINARY_FEATURES = [
 ]
 CATEGORICAL_FEATURES = ["MenopauseStatus", "HistologyType", "HormoneReceptorStatus"]
 
+
+def _to_float(value):
+    """Scalar equivalent of ``pd.to_numeric(value, errors="coerce")``."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+_YES_NO = {"Yes": 1, "No": 0, 1: 1, 0: 0}
+
+
+def _to_binary(value):
+    """Yes/No (or 1/0) → 1/0; anything else → 0 (pipeline expects numeric)."""
+    try:
+        return _YES_NO.get(value, 0)
+    except TypeError:  # unhashable, e.g. a list
+        return 0
+
+
+def _as_is(value):
+    return value
+
+
+# One converter per column, in EXPECTED_FEATURES order
+ROW_CONVERTERS = [
+    (feat, _to_float if feat in NUMERIC_FEATURES else _to_binary if feat in BINARY_FEATURES else _as_is)
+    for feat in EXPECTED_FEATURES
+]
+
+# Fixed per-column dtypes for every frame handed to the pipeline.  Inferred
+# dtypes would depend on the other rows in a batch (pandas turns a None next
+# to strings into NaN, which the imputer then fills), so a row must be
+# transformed identically whether it is scored alone or batched.
+FRAME_DTYPES = {
+    feat: "float64" if feat in NUMERIC_FEATURES else "int64" if feat in BINARY_FEATURES else object
+    for feat in EXPECTED_FEATURES
+}
+
+
+def _rows_frame(rows: list) -> pd.DataFrame:
+    """Converted rows as a DataFrame with FRAME_DTYPES columns."""
+    return pd.DataFrame(rows, columns=EXPECTED_FEATURES, dtype=object).astype(FRAME_DTYPES)
+
+
 # ──────────────────────────────────────────────
 #  Feature importance (coefficient-based for LR, SHAP fallback)
 # ──────────────────────────────────────────────
@@ -71,7 +130,61 @@ def _get_transformed_feature_names():
         return None
 
 
-def _compute_shap_explanation(X_raw_df, X_transformed, top_n=5):
+def _clean_name(raw: str) -> str:
+    """Clean up feature names: remove prefixes like "cont__", "cat__"."""
+    for prefix in ("cont__", "cat__", "bin__", "remainder__"):
+        if raw.startswith(prefix):
+            raw = raw[len(prefix):]
+    return raw.replace("_", " ")
+
+
+def _top_indices(magnitudes: np.ndarray, top_n: int) -> np.ndarray:
+    """Indices of the ``top_n`` largest magnitudes, largest first.
+
+    Same result as a stable descending sort truncated to ``top_n`` (ties keep
+    feature order), but selects with a partial partition instead of sorting.
+    """
+    top_n = min(top_n, magnitudes.size)
+    if top_n <= 0:
+        return np.empty(0, dtype=np.intp)
+    kth = np.partition(magnitudes, -top_n)[-top_n]
+    above = np.flatnonzero(magnitudes > kth)
+    ties = np.flatnonzero(magnitudes == kth)[: top_n - above.size]
+    idx = np.concatenate([above, ties])
+    return idx[np.argsort(-magnitudes[idx], kind="stable")]
+
+
+# Invariant per-model artefacts, computed once instead of on every request
+FEATURE_NAMES = _get_transformed_feature_names()
+COEFS = model.coef_[0] if hasattr(model, "coef_") else None  # shape: (n_features,)
+if COEFS is not None and (FEATURE_NAMES is None or len(FEATURE_NAMES) != len(COEFS)):
+    FEATURE_NAMES = [f"feature_{i}" for i in range(len(COEFS))]
+CLEAN_NAMES = [_clean_name(name) for name in FEATURE_NAMES] if FEATURE_NAMES else None
+
+
+def _positive_proba(X) -> np.ndarray:
+    """Probability of the positive class for each row of transformed ``X``.
+
+    For the linear model the logits come from a per-row einsum instead of a
+    BLAS matrix product, whose rounding depends on the batch shape, so a
+    row's probability does not change with the rows batched alongside it.
+    """
+    if COEFS is None:
+        return model.predict_proba(X)[:, 1]
+    logits = np.einsum("ij,j->i", np.asarray(X, dtype=np.float64), COEFS) + model.intercept_[0]
+    return expit(logits)
+
+
+def _load_shap():
+    """Import SHAP on first use; the coefficient path never needs it."""
+    global shap
+    if shap is None:
+        import shap as _shap
+        shap = _shap
+    return shap
+
+
+def _compute_shap_explanation(X_raw, X_transformed, top_n=5):
     """
     Compute per-prediction feature contributions.
 
@@ -82,26 +195,19 @@ def _compute_shap_explanation(X_raw_df, X_transformed, top_n=5):
     Falls back to generic SHAP if coefficient extraction fails.
     """
     try:
-        feature_names = _get_transformed_feature_names()
-
         # Prefer coefficient-based per-sample contributions (exact for LR)
-        if hasattr(model, "coef_"):
-            coefs = model.coef_[0]  # shape: (n_features,)
-
+        if COEFS is not None:
             # X_transformed may be sparse
             if hasattr(X_transformed, "toarray"):
                 x_arr = X_transformed.toarray()[0]
             else:
                 x_arr = np.asarray(X_transformed)[0]
 
-            contributions = coefs * x_arr  # per-feature contribution
-
-            if feature_names is None or len(feature_names) != len(contributions):
-                feature_names = [f"feature_{i}" for i in range(len(contributions))]
-
-            pairs = list(zip(feature_names, contributions))
+            values = COEFS * x_arr  # per-feature contribution
+            names = CLEAN_NAMES
         else:
             # Fallback: SHAP
+            _load_shap()
             try:
                 explainer = shap.TreeExplainer(model)
             except Exception:
@@ -112,29 +218,21 @@ def _compute_shap_explanation(X_raw_df, X_transformed, top_n=5):
                 sv = sv[1]
             values = sv[0] if sv.ndim == 2 else sv
 
+            feature_names = FEATURE_NAMES
             if feature_names is None or len(feature_names) != len(values):
                 feature_names = [f"feature_{i}" for i in range(len(values))]
+            names = [_clean_name(name) for name in feature_names]
 
-            pairs = list(zip(feature_names, values))
-
-        # Sort by |contribution| and take top N
-        pairs.sort(key=lambda x: abs(x[1]), reverse=True)
-        top = pairs[:top_n]
-
-        # Clean up feature names: remove prefixes like "cont__", "cat__"
-        def _clean_name(raw: str) -> str:
-            for prefix in ("cont__", "cat__", "bin__", "remainder__"):
-                if raw.startswith(prefix):
-                    raw = raw[len(prefix):]
-            return raw.replace("_", " ")
-
+        # Top N by |contribution|
+        magnitudes = np.abs(values)
+        idx = _top_indices(magnitudes, top_n)
         return [
             {
-                "feature": _clean_name(name),
-                "shap_value": round(float(abs(val)), 4),
-                "direction": "increases risk" if val > 0 else "decreases risk",
+                "feature": names[i],
+                "shap_value": mag,
+                "direction": "increases risk" if values[i] > 0 else "decreases risk",
             }
-            for name, val in top
+            for i, mag in zip(idx, np.round(magnitudes[idx], 4).tolist())
         ]
     except Exception as e:
         print(f"[SHAP WARNING] Could not compute feature contributions: {e}")
@@ -146,92 +244,73 @@ def _compute_shap_explanation(X_raw_df, X_transformed, top_n=5):
 #  Clinical recommendations engine
 # ──────────────────────────────────────────────
 
-def _generate_recommendations(data: dict, risk_tier: str) -> list[str]:
-    """Rule-based clinical recommendations per the implementation plan."""
-    recs = []
-
-    thick = float(data.get("ThickEndometrium", 0))
-    menopause = data.get("MenopauseStatus", "")
-    ca125 = float(data.get("CA125_Level", 0))
-    bleeding = data.get("AbnormalBleeding", "No")
-    age = float(data.get("Age", 0))
-    diabetes = data.get("Diabetes", "No")
-    estrogen = data.get("EstrogenTherapy", "No")
-    bmi = float(data.get("BMI", 0))
-    family = data.get("FamilyHistoryCancer", "No")
-
+# (predicate, message) pairs evaluated in order.  Predicates take the pre-cast
+# inputs from _recommendation_inputs plus the risk tier; messages are
+# str.format templates over the same inputs.
+RECOMMENDATION_RULES = [
     # Endometrial thickness rules
-    if thick > 4 and menopause == "Postmenopausal":
-        recs.append(
-            f"Elevated endometrial thickness ({thick} mm) exceeds the 4-5 mm "
-            f"postmenopausal threshold — consider endometrial biopsy."
-        )
-    if thick > 12 and menopause == "Premenopausal":
-        recs.append(
-            f"Endometrial thickness ({thick} mm) is elevated for a premenopausal "
-            f"patient — consider ultrasound follow-up."
-        )
-
+    (lambda d, tier: d["thick"] > 4 and d["menopause"] == "Postmenopausal",
+     "Elevated endometrial thickness ({thick} mm) exceeds the 4-5 mm "
+     "postmenopausal threshold — consider endometrial biopsy."),
+    (lambda d, tier: d["thick"] > 12 and d["menopause"] == "Premenopausal",
+     "Endometrial thickness ({thick} mm) is elevated for a premenopausal "
+     "patient — consider ultrasound follow-up."),
     # CA-125
-    if ca125 > 35:
-        recs.append(
-            f"CA-125 level ({ca125} U/mL) is above the reference range (0–35 U/mL) "
-            f"— further evaluation warranted."
-        )
-
+    (lambda d, tier: d["ca125"] > 35,
+     "CA-125 level ({ca125} U/mL) is above the reference range (0–35 U/mL) "
+     "— further evaluation warranted."),
     # Bleeding
-    if bleeding == "Yes" and menopause == "Postmenopausal":
-        recs.append(
-            "Abnormal uterine bleeding in a postmenopausal patient is a clinical "
-            "red flag — gynaecologic workup recommended."
-        )
-    if bleeding == "Yes" and age > 45:
-        recs.append(
-            "Abnormal bleeding after age 45 — endometrial evaluation recommended."
-        )
-
+    (lambda d, tier: d["bleeding"] == "Yes" and d["menopause"] == "Postmenopausal",
+     "Abnormal uterine bleeding in a postmenopausal patient is a clinical "
+     "red flag — gynaecologic workup recommended."),
+    (lambda d, tier: d["bleeding"] == "Yes" and d["age"] > 45,
+     "Abnormal bleeding after age 45 — endometrial evaluation recommended."),
     # Comorbidities
-    if diabetes == "Yes":
-        recs.append(
-            "Patient has comorbid diabetes — monitor for metabolic syndrome as an "
-            "independent risk factor."
-        )
-
+    (lambda d, tier: d["diabetes"] == "Yes",
+     "Patient has comorbid diabetes — monitor for metabolic syndrome as an "
+     "independent risk factor."),
     # HRT
-    if estrogen == "Yes" and risk_tier in ("Intermediate", "High"):
-        recs.append(
-            "Unopposed estrogen therapy in an elevated-risk patient — review HRT "
-            "regimen with provider."
-        )
-
+    (lambda d, tier: d["estrogen"] == "Yes" and tier in ("Intermediate", "High"),
+     "Unopposed estrogen therapy in an elevated-risk patient — review HRT "
+     "regimen with provider."),
     # Obesity
-    if bmi > 30:
-        recs.append(
-            f"Obesity (BMI {bmi}) is an established risk factor for uterine cancer "
-            f"— weight management counselling recommended."
-        )
-
+    (lambda d, tier: d["bmi"] > 30,
+     "Obesity (BMI {bmi}) is an established risk factor for uterine cancer "
+     "— weight management counselling recommended."),
     # Family history + high risk
-    if family == "Yes" and risk_tier == "High":
-        recs.append(
-            "Family history of cancer combined with high estimated risk — consider "
-            "genetic counselling (Lynch syndrome screening)."
-        )
-
-    # General tier-based
-    if risk_tier == "High":
-        recs.append(
-            "High estimated risk — strongly recommend gynaecologic oncology referral."
-        )
-    elif risk_tier == "Intermediate":
-        recs.append(
-            "Intermediate estimated risk — recommend clinical follow-up with gynaecologist."
-        )
-    else:
-        recs.append(
-            "Low estimated risk — routine screening per clinical guidelines."
-        )
+    (lambda d, tier: d["family"] == "Yes" and tier == "High",
+     "Family history of cancer combined with high estimated risk — consider "
+     "genetic counselling (Lynch syndrome screening)."),
+]
+
+# General tier-based recommendation, always appended last
+TIER_RECOMMENDATIONS = {
+    "High": "High estimated risk — strongly recommend gynaecologic oncology referral.",
+    "Intermediate": "Intermediate estimated risk — recommend clinical follow-up with gynaecologist.",
+}
+DEFAULT_TIER_RECOMMENDATION = "Low estimated risk — routine screening per clinical guidelines."
 
+
+def _recommendation_inputs(data: dict) -> dict:
+    """Cast the fields the rules look at once per request."""
+    return {
+        "thick": float(data.get("ThickEndometrium", 0)),
+        "menopause": data.get("MenopauseStatus", ""),
+        "ca125": float(data.get("CA125_Level", 0)),
+        "bleeding": data.get("AbnormalBleeding", "No"),
+        "age": float(data.get("Age", 0)),
+        "diabetes": data.get("Diabetes", "No"),
+        "estrogen": data.get("EstrogenTherapy", "No"),
+        "bmi": float(data.get("BMI", 0)),
+        "family": data.get("FamilyHistoryCancer", "No"),
+    }
+
+
+def _generate_recommendations(data: dict, risk_tier: str) -> list[str]:
+    """Rule-based clinical recommendations per the implementation plan."""
+    d = _recommendation_inputs(data)
+    recs = [message.format(**d) for applies, message in RECOMMENDATION_RULES if applies(d, risk_tier)]
+    recs.append(TIER_RECOMMENDATIONS.get(risk_tier, DEFAULT_TIER_RECOMMENDATION))
     return recs
 
 
@@ -254,11 +333,254 @@ def _classify_risk(prob: float) -> str:
     return "Intermediate"
 
 
+# ──────────────────────────────────────────────
+#  Low-risk fast path
+# ──────────────────────────────────────────────
+# Rows inside LOW_RISK_BOX (numerics within the ranges below, every binary
+# flag "No", categoricals one of the fitted categories) skip the batcher and
+# the ColumnTransformer: the row is scaled / one-hot encoded directly and
+# dotted with the coefficients.  At load the logit is bounded over the whole
+# box, and the path is only enabled if that bound proves the tier is "Low".
+
+LOW_RISK_BOX = {
+    "Age": (18, 34),
+    "BMI": (15, 24.9),
+    "ThickEndometrium": (0, 4),
+    "CA125_Level": (0, 10),
+    "Parity": (0, 3),
+    "Gravidity": (0, 4),
+}
+
+
+def _build_low_risk_path():
+    """Precompute the direct encoding for LOW_RISK_BOX, or None if unsound."""
+    try:
+        if COEFS is None:
+            raise ValueError("model has no coefficients")
+        steps = {name: (trans, list(cols)) for name, trans, cols in pipeline.transformers_}
+        if set(steps) != {"cont", "bin", "cat"} or set(steps["cont"][1]) != set(LOW_RISK_BOX):
+            raise ValueError("unexpected pipeline layout")
+        scaler = steps["cont"][0].named_steps["scaler"]
+        ohe = steps["cat"][0].named_steps["ohe"]
+        offsets = pipeline.output_indices_
+
+        numeric, logit_max = [], float(model.intercept_[0])
+        for j, feat in enumerate(steps["cont"][1]):
+            col = offsets["cont"].start + j
+            lo, hi = LOW_RISK_BOX[feat]
+            mean, scale = scaler.mean_[j], scaler.scale_[j]
+            numeric.append((EXPECTED_FEATURES.index(feat), col, lo, hi, mean, scale))
+            logit_max += max(COEFS[col] * (lo - mean) / scale, COEFS[col] * (hi - mean) / scale)
+
+        binary = [EXPECTED_FEATURES.index(feat) for feat in steps["bin"][1]]
+
+        # value -> output column (-1 for the dropped reference category)
+        categorical, col = [], offsets["cat"].start
+        drop_idx = ohe.drop_idx_ if ohe.drop_idx_ is not None else [None] * len(ohe.categories_)
+        for feat, cats, drop in zip(steps["cat"][1], ohe.categories_, drop_idx):
+            columns = {}
+            for k, value in enumerate(cats):
+                if drop is not None and k == drop:
+                    columns[value] = -1
+                else:
+                    columns[value] = col
+                    col += 1
+            categorical.append((EXPECTED_FEATURES.index(feat), columns))
+            logit_max += max(COEFS[c] if c >= 0 else 0.0 for c in columns.values())
+
+        path = {
+            "numeric": numeric,
+            "binary": binary,
+            "categorical": categorical,
+            "width": len(COEFS),
+        }
+
+        if not expit(logit_max) < LOW_UPPER:
+            raise ValueError(f"box is not provably low risk (p <= {expit(logit_max):.4f})")
+
+        # The direct encoding must reproduce the pipeline exactly
+        sample = [np.nan] * len(EXPECTED_FEATURES)
+        for i, _, lo, _, _, _ in numeric:
+            sample[i] = float(lo)
+        for i in binary:
+            sample[i] = 0
+        for i, columns in categorical:
+            sample[i] = next(iter(columns))
+        expected = pipeline.transform(_rows_frame([sample]))
+        if not np.array_equal(_low_risk_encode(sample, path), np.asarray(expected)):
+            raise ValueError("direct encoding does not match the pipeline")
+
+        print(f"[INFO]  Low-risk fast path enabled (box p <= {expit(logit_max):.4f})")
+        return path
+    except Exception as e:
+        print(f"[WARN]  Low-risk fast path disabled: {e}")
+        return None
+
+
+def _low_risk_encode(row: list, path: dict):
+    """Transformed (1, n) row if ``row`` lies inside the box, else None."""
+    x = np.zeros((1, path["width"]))
+    for i, col, lo, hi, mean, scale in path["numeric"]:
+        value = row[i]
+        if not lo <= value <= hi:  # also rejects NaN
+            return None
+        x[0, col] = (value - mean) / scale
+    for i in path["binary"]:
+        if row[i] != 0:
+            return None
+    for i, columns in path["categorical"]:
+        try:
+            col = columns[row[i]]
+        except (KeyError, TypeError):
+            return None
+        if col >= 0:
+            x[0, col] = 1.0
+    return x
+
+
+LOW_RISK_PATH = _build_low_risk_path()
+
+
+# ──────────────────────────────────────────────
+#  Request batching
+# ──────────────────────────────────────────────
+# Concurrent requests are coalesced into one pipeline.transform + scoring
+# call: a background thread takes the first queued row plus whatever else is
+# already waiting (up to MAX_BATCH), and resolves each request's Future with its
+# (X_transformed, probability).  Rows that queue up while a batch is being
+# scored form the next batch, so nothing waits on a timer by default;
+# MAX_WAIT_MS > 0 additionally holds each batch open for late arrivals.
+
+MAX_BATCH = int(os.environ.get("UTERINE_MAX_BATCH", 64))
+MAX_WAIT_MS = float(os.environ.get("UTERINE_MAX_WAIT_MS", 0))
+SCORE_TIMEOUT_S = float(os.environ.get("UTERINE_SCORE_TIMEOUT_S", 1))
+
+_request_queue = queue.Queue()
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+# Single-row batches (the common case at low load) overwrite the cells of one
+# preallocated input frame instead of building a new DataFrame each time.
+# Rows with non-string categoricals (None, lists, ...) get a fresh frame
+# rather than being written cell by cell.
+_ROW_BUFFER = _rows_frame(
+    [[0.0 if f in NUMERIC_FEATURES else 0 if f in BINARY_FEATURES else "" for f in EXPECTED_FEATURES]]
+)
+_row_buffer_lock = threading.Lock()
+CATEGORICAL_POS = [EXPECTED_FEATURES.index(f) for f in CATEGORICAL_FEATURES]
+
+
+def _score_rows(rows: list):
+    """Transform and score a list of converted rows in one call."""
+    if len(rows) == 1 and all(isinstance(rows[0][i], str) for i in CATEGORICAL_POS):
+        with _row_buffer_lock:
+            for i, value in enumerate(rows[0]):
+                _ROW_BUFFER.iat[0, i] = value
+            X_transformed = pipeline.transform(_ROW_BUFFER)
+    else:
+        X_transformed = pipeline.transform(_rows_frame(rows))
+    proba = _positive_proba(X_transformed)
+    return X_transformed, proba
+
+
+def _batch_worker():
+    while True:
+        items = [_request_queue.get()]
+        deadline = time.monotonic() + MAX_WAIT_MS / 1000.0
+        while len(items) < MAX_BATCH:
+            try:
+                items.append(_request_queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(_request_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        try:
+            X_transformed, proba = _score_rows([row for row, _ in items])
+        except Exception:
+            # One bad row must not fail the whole batch: score individually
+            for row, future in items:
+                try:
+                    X_row, p = _score_rows([row])
+                    future.set_result((X_row, p[0]))
+                except Exception as exc:
+                    future.set_exception(exc)
+            continue
+        for i, (_, future) in enumerate(items):
+            future.set_result((X_transformed[i:i + 1], proba[i]))
+
+
+def score(row: list):
+    """Queue one converted row and wait for its (X_transformed, probability).
+
+    Raises ``FutureTimeoutError`` if no result arrives within SCORE_TIMEOUT_S.
+    """
+    global _batcher
+    # Started lazily so each (possibly forked) worker process gets its own
+    # thread, and restarted should it ever have died
+    if _batcher is None or not _batcher.is_alive():
+        with _batcher_lock:
+            if _batcher is None or not _batcher.is_alive():
+                _batcher = threading.Thread(target=_batch_worker, name="uterine-batcher", daemon=True)
+                _batcher.start()
+
+    future = Future()
+    _request_queue.put((row, future))
+    return future.result(timeout=SCORE_TIMEOUT_S)
+
+
+def _infer(row: list):
+    """Probability and feature contributions for one converted row."""
+    X_transformed, proba = score(row)
+    return proba, _compute_shap_explanation(row, X_transformed, top_n=5)
+
+
+# Form inputs repeat often (re-submissions, dashboards); memoise on the row
+@lru_cache(maxsize=4096)
+def _infer_cached(key: tuple):
+    return _infer(list(key))
+
+
+def infer(row: list):
+    """Memoised ``_infer``; the converted row itself is the cache key.
+
+    Rows inside the low-risk box are scored directly and never hit the cache.
+    """
+    if LOW_RISK_PATH is not None:
+        X_low = _low_risk_encode(row, LOW_RISK_PATH)
+        if X_low is not None:
+            proba = _positive_proba(X_low)[0]
+            return proba, _compute_shap_explanation(row, X_low, top_n=5)
+
+    key = tuple(row)
+    try:
+        hash(key)
+    except TypeError:  # unhashable value (e.g. a list) — run uncached
+        return _infer(row)
+    return _infer_cached(key)
+
+
 # ──────────────────────────────────────────────
 #  Flask application
 # ──────────────────────────────────────────────
 
+class ORJSONProvider(DefaultJSONProvider):
+    """``jsonify`` backend using orjson; keys are sorted like Flask's default."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_SORT_KEYS).decode()
+
+
 app = Flask(__name__)
+if orjson is not None:
+    app.json = ORJSONProvider(app)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
 
@@ -296,30 +618,17 @@ def predict():
         if missing:
             return jsonify({"error": f"Missing fields: {', '.join(missing)}"}), 400
 
-        # ---- build DataFrame in the right column order ----
-        row = {feat: data[feat] for feat in EXPECTED_FEATURES}
-        df = pd.DataFrame([row])
-
-        # Coerce types
-        for col in NUMERIC_FEATURES:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-
-        # Convert binary Yes/No → 1/0 (pipeline expects numeric)
-        for col in BINARY_FEATURES:
-            df[col] = df[col].map({"Yes": 1, "No": 0, 1: 1, 0: 0}).fillna(0).astype(int)
+        # ---- coerce types in the right column order ----
+        row = [convert(data[feat]) for feat, convert in ROW_CONVERTERS]
 
-        # ---- preprocess + predict ----
-        X_transformed = pipeline.transform(df)
-        proba = model.predict_proba(X_transformed)[0][1]
+        # ---- preprocess + predict + SHAP (batched, memoised per row) ----
+        proba, shap_explanation = infer(row)
         prediction = int(proba >= 0.5)
 
         # ---- risk tier ----
         risk_tier = _classify_risk(proba)
         risk_color = RISK_COLORS[risk_tier]
 
-        # ---- SHAP ----
-        shap_explanation = _compute_shap_explanation(df, X_transformed, top_n=5)
-
         # ---- clinical recommendations ----
         recommendations = _generate_recommendations(data, risk_tier)
 
@@ -341,6 +650,10 @@ def predict():
             ),
         })
 
+    except FutureTimeoutError:
+        traceback.print_exc()
+        return jsonify({"error": "Prediction timed out; please retry."}), 503
+
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
@@ -357,4 +670,4 @@ if __name__ == "__main__":
     print(f"  Strategy: {thresholds_data.get('best_strategy', 'CW')}")
     print(f"  Low ≤ {LOW_UPPER:.2f}  |  High ≥ {HIGH_LOWER:.2f}")
     print("=" * 60)
-    app.run(host="0.0.0.0", port=5007, debug=True)
+    app.run(host="0.0.0.0", port=5007)
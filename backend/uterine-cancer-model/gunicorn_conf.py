@@ -0,0 +1,31 @@
+"""
+Gunicorn configuration for the uterine cancer risk API.
+
+    gunicorn -c gunicorn_conf.py app:app
+
+The app is preloaded so the pipeline, model and cached coefficients are loaded
+once in the master and shared with the workers via copy-on-write fork.
+"""
+
+import gc
+import os
+
+# One BLAS/OpenMP thread per worker; must be set before numpy is imported.
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5007)}"
+preload_app = True
+workers = int(os.environ.get("WEB_CONCURRENCY", max(2, (os.cpu_count() or 2) // 2)))
+worker_class = "gthread"
+threads = 4
+timeout = 60
+
+
+def when_ready(server):
+    # Runs in the master after the preloaded app is imported and before any
+    # worker is forked.  Moving every live object into the permanent GC
+    # generation stops the workers' collector from writing to their headers,
+    # so the pages holding the pipeline, model and coefficients stay shared
+    # instead of being copied into each worker over time.
+    gc.collect()
+    gc.freeze()